@@ -0,0 +1,36 @@
+"""Precompute the TF-IDF index for the Scopus corpus.
+
+Run from the repository root:
+
+    $ python -m scripts.build_tfidf
+"""
+
+import numpy as np
+
+from tfidf_index import (
+    INDEX_DIR, SIMILARITY_FIELDS, csv_fingerprint, field_similarity, fit_field_vectors, read_scopus, save_index
+)
+
+
+def check_null_scores(scopus_data, vectorizer, fields):
+    """Papers missing a field must score NaN for it, and only those papers"""
+    sample = scopus_data['Abstract'].drop_nulls()
+    q_vec = vectorizer.transform(sample.head(1).to_list()).toarray().ravel()
+    for field in SIMILARITY_FIELDS:
+        scores = field_similarity(*fields[field], q_vec)
+        null_rows = scopus_data[field].is_null().to_numpy()
+        if not np.array_equal(np.isnan(scores), null_rows):
+            raise AssertionError(f"{field}: NaN scores do not match the {null_rows.sum()} null rows")
+        print(f"{field}: {null_rows.sum()} papers without a value score NaN")
+
+
+def main():
+    scopus_data = read_scopus()
+    vectorizer, fields = fit_field_vectors(scopus_data)
+    check_null_scores(scopus_data, vectorizer, fields)
+    save_index(vectorizer, fields, csv_fingerprint(scopus_data))
+    print(f"Saved TF-IDF index for {len(scopus_data)} papers to {INDEX_DIR}/")
+
+
+if __name__ == "__main__":
+    main()
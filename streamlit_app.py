@@ -8,20 +8,18 @@ Original file is located at
 """
 
 
+import functools
+import io
+
 import streamlit as st
 import pandas as pd
+import polars as pl
 import numpy as np
-import requests
-from bs4 import BeautifulSoup
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import io
-import base64
+
+import tfidf_index
 
 # Set page config
 st.set_page_config(
@@ -57,99 +55,117 @@ if 'processed_data' not in st.session_state:
     st.session_state.processed_data = None
 if 'recommendations' not in st.session_state:
     st.session_state.recommendations = None
+if 'ranked_recommendations' not in st.session_state:
+    st.session_state.ranked_recommendations = None
+if 'top_20' not in st.session_state:
+    st.session_state.top_20 = None
+
+@st.cache_data(show_spinner=False)
+def read_datasets():
+    """Read the required datasets; raises FileNotFoundError, which is never cached"""
+    # Load scopus data
+    scopus_filtered = tfidf_index.read_scopus()
+
+    # Load FUTA authors data, dropping fully blank rows
+    futa_authors = pl.read_csv('futa_authors.csv')
+    futa_authors = futa_authors.filter(~pl.all_horizontal(pl.all().is_null()))
+    futa_authors = futa_authors.with_columns(pl.col('Auth-ID').cast(pl.Int64, strict=False))
+
+    return scopus_filtered, futa_authors
 
 def load_data():
     """Load the required datasets"""
     try:
-        # Load scopus data
-        scopus_df = pd.read_csv('scopus.csv')
-        scopus_filtered = scopus_df[['Author full names', 'Author(s) ID', 'Abstract', 'Author Keywords', 'Index Keywords']]
-
-        # Load FUTA authors data
-        futa_authors = pd.read_csv('futa_authors.csv')
-        futa_authors = futa_authors.dropna(how='all')
-
-        return scopus_filtered, futa_authors
+        return read_datasets()
     except FileNotFoundError as e:
         st.error(f"Required CSV files not found: {e}")
         return None, None
 
 
 
-def calculate_similarity(target_abstract, scopus_data):
-    """Calculate cosine similarity between target abstract and scopus data"""
-    results = []
-
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    for i in range(len(scopus_data)):
-        progress = (i + 1) / len(scopus_data)
-        progress_bar.progress(progress)
-        status_text.text(f'Processing paper {i+1}/{len(scopus_data)}')
+@st.cache_resource(show_spinner=False)
+def build_index(scopus_data):
+    """Load the persisted TF-IDF index, rebuilding it when stale"""
+    return tfidf_index.load_or_build(scopus_data)
 
-        vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
+@st.cache_data(max_entries=64, show_spinner=False)
+def embed_query(target_abstract, index_fingerprint, _vectorizer):
+    """Transform the target abstract into a dense TF-IDF query vector.
 
-        # Abstract similarity
-        try:
-            vector_abs = vectorizer.fit_transform([scopus_data['Abstract'].iloc[i], target_abstract])
-            similarity_abs = cosine_similarity(vector_abs)[0][1]
-        except:
-            similarity_abs = 0
-
-        # Author keywords similarity
-        try:
-            if pd.notna(scopus_data['Author Keywords'].iloc[i]):
-                vector_aut = vectorizer.fit_transform([scopus_data['Author Keywords'].iloc[i], target_abstract])
-                similarity_aut = cosine_similarity(vector_aut)[0][1]
-            else:
-                similarity_aut = np.nan
-        except:
-            similarity_aut = np.nan
+    index_fingerprint is part of the cache key so vectors built with one
+    index's IDF weights are never reused against a refitted index.
+    """
+    return _vectorizer.transform([target_abstract]).toarray().ravel()
 
-        # Index keywords similarity
-        try:
-            if pd.notna(scopus_data['Index Keywords'].iloc[i]):
-                vector_ind = vectorizer.fit_transform([scopus_data['Index Keywords'].iloc[i], target_abstract])
-                similarity_ind = cosine_similarity(vector_ind)[0][1]
-            else:
-                similarity_ind = np.nan
-        except:
-            similarity_ind = np.nan
+def calculate_similarity(target_abstract, scopus_data):
+    """Calculate cosine similarity between target abstract and scopus data"""
+    vectorizer, fields, index_fingerprint = build_index(scopus_data)
+    q_vec = embed_query(target_abstract, index_fingerprint, vectorizer)
 
-        results.append([
-            scopus_data['Author full names'].iloc[i],
-            scopus_data['Author(s) ID'].iloc[i],
-            similarity_abs,
-            similarity_aut,
-            similarity_ind
-        ])
+    similarity_abs, similarity_aut, similarity_ind = [
+        tfidf_index.field_similarity(*fields[field], q_vec)
+        for field in tfidf_index.SIMILARITY_FIELDS
+    ]
 
-    progress_bar.empty()
-    status_text.empty()
+    # Papers without an abstract score 0 rather than NaN
+    np.nan_to_num(similarity_abs, copy=False)
 
-    return pd.DataFrame(results, columns=['Authors', 'IDs', 'Score_Abs', 'Score_Author', 'Score_Index'])
+    return pl.DataFrame({
+        'Authors': scopus_data['Author full names'],
+        'IDs': scopus_data['Author(s) ID'],
+        'Score_Abs': similarity_abs,
+        'Score_Author': similarity_aut,
+        'Score_Index': similarity_ind
+    })
 
 def process_author_ids(results_df, futa_authors):
     """Process author IDs and merge with FUTA authors data"""
-    author_scores = []
-
-    for i, row in results_df.iterrows():
-        if pd.notna(row['IDs']):
-            ids = str(row['IDs']).split(';')
-            for author_id in ids:
-                try:
-                    author_scores.append([float(author_id.strip()), np.round(row['Score_Abs'], 3)])
-                except ValueError:
-                    continue
-
-    author_scores_df = pd.DataFrame(author_scores, columns=['Auth-ID', 'Score'])
+    author_scores_df = (
+        results_df
+        .filter(pl.col('IDs').is_not_null())
+        .select(
+            pl.col('IDs').str.split(';').alias('Auth-ID'),
+            pl.col('Score_Abs').round(3).alias('Score')
+        )
+        # One row per (author, paper) pair
+        .explode('Auth-ID')
+        .with_columns(pl.col('Auth-ID').str.strip_chars().cast(pl.Int64, strict=False))
+        .drop_nulls('Auth-ID')
+    )
 
     # Merge with FUTA authors
-    merged_df = author_scores_df.merge(futa_authors, how='inner', on='Auth-ID')
-
-    return merged_df.sort_values('Score', ascending=False)
-
+    merged_df = author_scores_df.join(futa_authors, how='inner', on='Auth-ID')
+
+    # Ranking happens once per query, when the results are stored
+    return merged_df
+
+NAME_CANDIDATES = ['Name', 'Author', 'Full Name', 'Author Name', 'Authors', 'Author full names']
+DEPT_CANDIDATES = ['Department', 'Dept', 'Faculty', 'School']
+ID_CANDIDATES = ['Auth-ID', 'Author(s) ID', 'ID', 'Author ID']
+
+@functools.lru_cache(maxsize=None)
+def resolve_columns(columns):
+    """Map a tuple of column names to (name_col, score_col, dept_col, id_col)"""
+    def first_present(candidates):
+        return next((candidate for candidate in candidates if candidate in columns), None)
+
+    score_col = 'Score' if 'Score' in columns else None
+    return first_present(NAME_CANDIDATES), score_col, first_present(DEPT_CANDIDATES), first_present(ID_CANDIDATES)
+
+def hash_dataframe(df):
+    """Content hash used to key caches on a recommendations frame"""
+    # Values alone would collide for frames that differ only in column names
+    return repr(tuple(df.columns)).encode() + pd.util.hash_pandas_object(df, index=False).values.tobytes()
+
+# Two downloads (top 20 and complete results) per query
+@st.cache_data(max_entries=32, show_spinner=False, hash_funcs={pd.DataFrame: hash_dataframe})
+def to_csv_bytes(df):
+    """Serialise a frame to UTF-8 CSV bytes for st.download_button"""
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, encoding='utf-8')
+    return buf.getvalue()
+
+@st.cache_data(max_entries=16, show_spinner=False, hash_funcs={pd.DataFrame: hash_dataframe})
 def create_visualizations(recommendations_df):
     """Create visualizations for the recommendations"""
     
@@ -158,12 +174,7 @@ def create_visualizations(recommendations_df):
         return None, None, None
     
     # Find the correct column names
-    name_candidates = ['Name', 'Author', 'Full Name', 'Author Name', 'Authors', 'Author full names']
-    name_col = None
-    for candidate in name_candidates:
-        if candidate in recommendations_df.columns:
-            name_col = candidate
-            break
+    name_col, score_col, dept_col, _ = resolve_columns(tuple(recommendations_df.columns))
     
     # If no standard name column found, use the first string column
     if name_col is None:
@@ -178,18 +189,16 @@ def create_visualizations(recommendations_df):
         name_col = 'Name'
     
     # Ensure Score column exists
-    if 'Score' not in recommendations_df.columns:
+    if score_col is None:
         print("Warning: 'Score' column not found. Using first numeric column.")
         numeric_cols = recommendations_df.select_dtypes(include=[np.number]).columns
         if len(numeric_cols) > 0:
             score_col = numeric_cols[0]
         else:
             return None, None, None
-    else:
-        score_col = 'Score'
 
     # Top 20 recommendations bar chart
-    top_20 = recommendations_df.head(20).copy()
+    top_20 = recommendations_df.head(20)
     
     try:
         fig1 = px.bar(
@@ -222,14 +231,6 @@ def create_visualizations(recommendations_df):
 
     # Department-wise analysis if department column exists
     fig3 = None
-    dept_candidates = ['Department', 'Dept', 'Faculty', 'School']
-    dept_col = None
-    
-    for candidate in dept_candidates:
-        if candidate in recommendations_df.columns:
-            dept_col = candidate
-            break
-    
     if dept_col:
         try:
             dept_stats = recommendations_df.groupby(dept_col).agg({
@@ -293,15 +294,20 @@ def main():
                 st.success(f"Loaded {len(scopus_data)} papers and {len(futa_authors)} FUTA authors")
 
                 # Calculate similarities
-                with st.spinner("Calculating similarities..."):
+                with st.spinner(f"Scoring {len(scopus_data)} papers..."):
                     similarity_results = calculate_similarity(target_abstract, scopus_data)
 
                 # Process results
                 with st.spinner("Processing recommendations..."):
                     recommendations = process_author_ids(similarity_results, futa_authors)
 
-                st.session_state.recommendations = recommendations
-                st.session_state.processed_data = similarity_results
+                st.session_state.recommendations = recommendations.to_pandas()
+                # Tab bodies run on every rerun, so the full ranking is built once here
+                st.session_state.ranked_recommendations = st.session_state.recommendations.sort_values(
+                    'Score', ascending=False
+                )
+                st.session_state.top_20 = st.session_state.ranked_recommendations.head(20)
+                st.session_state.processed_data = similarity_results.to_pandas()
 
                 st.success("✅ Recommendations generated successfully!")
 
@@ -314,6 +320,7 @@ def main():
     # Display results
     if st.session_state.recommendations is not None:
         recommendations = st.session_state.recommendations
+        top_20 = st.session_state.top_20
 
         # Summary metrics
         col1, col2, col3, col4 = st.columns(4)
@@ -328,7 +335,7 @@ def main():
             st.metric("Max Similarity", f"{recommendations['Score'].max():.3f}")
 
         with col4:
-            st.metric("Top 20 Avg", f"{recommendations.head(20)['Score'].mean():.3f}")
+            st.metric("Top 20 Avg", f"{top_20['Score'].mean():.3f}")
 
         # Tabs for different views
         tab1, tab2, tab3 = st.tabs(["📊 Recommendations", "📈 Analysis", "📋 Raw Data"])
@@ -338,28 +345,17 @@ def main():
         with tab1:
             st.subheader("Top 20 Recommended Internal Examiners")
 
-            # Display top recommendations
-            top_20 = recommendations.head(20)
-            
             # Debug: Show what columns are actually available
             st.write("Available columns:", list(top_20.columns))
             
             # Create a formatted dataframe for display
-            display_df = top_20.copy()
-            display_df['Rank'] = range(1, len(display_df) + 1)
-            display_df['Similarity Score'] = display_df['Score'].apply(lambda x: f"{x:.3f}")
+            display_df = top_20.assign(Rank=range(1, len(top_20) + 1))
+            name_col, _, dept_col, id_col = resolve_columns(tuple(recommendations.columns))
 
             # Build display_columns based on what's actually available
             display_columns = ['Rank']
             
             # Check for name column (could be 'Name', 'Author', 'Full Name', etc.)
-            name_candidates = ['Name', 'Author', 'Full Name', 'Author Name', 'Authors']
-            name_col = None
-            for candidate in name_candidates:
-                if candidate in display_df.columns:
-                    name_col = candidate
-                    break
-            
             if name_col:
                 display_columns.append(name_col)
             else:
@@ -367,37 +363,34 @@ def main():
                 st.stop()
             
             # Check for department column
-            if 'Department' in display_df.columns:
-                display_columns.append('Department')
+            if dept_col:
+                display_columns.append(dept_col)
             
             # Add similarity score
-            display_columns.append('Similarity Score')
+            display_columns.append('Score')
             
             # Check for ID column
-            id_candidates = ['Auth-ID', 'Author(s) ID', 'ID', 'Author ID']
-            id_col = None
-            for candidate in id_candidates:
-                if candidate in display_df.columns:
-                    id_col = candidate
-                    break
-            
             if id_col:
                 display_columns.append(id_col)
 
             # Filter display_columns to only include columns that actually exist
             final_display_columns = [col for col in display_columns if col in display_df.columns]
             
+            styled = (
+                display_df[final_display_columns]
+                .rename(columns={'Score': 'Similarity Score'})
+                .style.format({'Similarity Score': '{:.3f}'})
+            )
             st.dataframe(
-                display_df[final_display_columns],
+                styled,
                 use_container_width=True,
                 hide_index=True
             )
 
             # Download button
-            csv = display_df.to_csv(index=False)
             st.download_button(
                 label="📥 Download Top 20 Recommendations",
-                data=csv,
+                data=to_csv_bytes(display_df),
                 file_name="thesis_recommendations.csv",
                 mime="text/csv"
             )
@@ -407,7 +400,7 @@ def main():
 
             try:
                 # Create visualizations
-                fig1, fig2, fig3 = create_visualizations(recommendations)
+                fig1, fig2, fig3 = create_visualizations(st.session_state.ranked_recommendations)
 
                 # Display charts if they were created successfully
                 if fig1 is not None:
@@ -449,12 +442,7 @@ def main():
 
             with col2:
                 # Find department column
-                dept_candidates = ['Department', 'Dept', 'Faculty', 'School']
-                dept_col = None
-                for candidate in dept_candidates:
-                    if candidate in recommendations.columns:
-                        dept_col = candidate
-                        break
+                _, _, dept_col, _ = resolve_columns(tuple(recommendations.columns))
                 
                 if dept_col:
                     st.write(f"**Top {dept_col}s:**")
@@ -469,13 +457,13 @@ def main():
 
         with tab3:
             st.subheader("Complete Results")
-            st.dataframe(recommendations, use_container_width=True)
+            ranked = st.session_state.ranked_recommendations
+            st.dataframe(ranked, use_container_width=True)
 
             # Download full results
-            full_csv = recommendations.to_csv(index=False)
             st.download_button(
                 label="📥 Download Complete Results",
-                data=full_csv,
+                data=to_csv_bytes(ranked),
                 file_name="complete_recommendations.csv",
                 mime="text/csv"
             )
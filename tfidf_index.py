@@ -0,0 +1,145 @@
+"""Fit, persist and reload the shared TF-IDF index over the Scopus corpus"""
+
+import hashlib
+import os
+import pickle
+
+import joblib
+import numpy as np
+import polars as pl
+import scipy.sparse
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import make_pipeline
+
+SCOPUS_CSV = 'scopus.csv'
+INDEX_DIR = 'tfidf_index'
+SIMILARITY_FIELDS = ['Abstract', 'Author Keywords', 'Index Keywords']
+SCOPUS_COLUMNS = ['Author full names', 'Author(s) ID'] + SIMILARITY_FIELDS
+FIELD_FILES = {
+    'Abstract': 'abs',
+    'Author Keywords': 'aut',
+    'Index Keywords': 'ind',
+}
+
+
+def _matrix_path(field, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, f"tfidf_{FIELD_FILES[field]}.npz")
+
+
+def _model_path(index_dir=INDEX_DIR):
+    return os.path.join(index_dir, "tfidf_pipeline.joblib")
+
+
+def read_scopus(csv_path=SCOPUS_CSV):
+    """Read the Scopus columns the app needs as strings.
+
+    Scopus exports missing keywords as quoted empty strings; those are read
+    as nulls so keyword-less papers are masked out of scoring.
+    """
+    return pl.read_csv(
+        csv_path,
+        columns=SCOPUS_COLUMNS,
+        schema_overrides={col: pl.Utf8 for col in SCOPUS_COLUMNS},
+        null_values=['']
+    )
+
+
+def field_similarity(X_corpus, mask, q_vec):
+    """Score the fitted corpus rows against the query; null rows stay NaN"""
+    scores = np.full(len(mask), np.nan)
+    # Rows are L2-normalised, so a CSR matrix-vector product against the
+    # dense query gives cosine similarity without a sparse result matrix
+    scores[mask] = X_corpus @ q_vec
+    return scores
+
+
+def fit_field_vectors(scopus_data):
+    """Fit one hashed TF-IDF pipeline shared by every field.
+
+    Each field is tokenised once; the IDF weights are learned over all three
+    fields together, so a single query vector scores against every field.
+    Returns the fitted pipeline and a {field: (corpus matrix, mask)} dict,
+    where mask marks the non-null corpus rows the matrix holds.
+    """
+    hasher = HashingVectorizer(
+        n_features=2**15, stop_words='english', alternate_sign=False, norm=None,
+        # float32 halves the corpus matrix; ample precision for cosine scores
+        dtype=np.float32
+    )
+    tfidf = TfidfTransformer()
+
+    counts, masks = {}, {}
+    for field in SIMILARITY_FIELDS:
+        texts = scopus_data[field]
+        masks[field] = texts.is_not_null().to_numpy()
+        counts[field] = hasher.transform(texts.drop_nulls().to_list())
+
+    # Hashing is stateless, so fitting only learns the IDF weights
+    tfidf.fit(scipy.sparse.vstack([counts[field] for field in SIMILARITY_FIELDS]))
+
+    fields = {field: (tfidf.transform(counts[field]), masks[field]) for field in SIMILARITY_FIELDS}
+    return make_pipeline(hasher, tfidf), fields
+
+
+def csv_fingerprint(scopus_data, csv_path=SCOPUS_CSV):
+    """Identify the corpus an index was built from: row count, CSV size and hash"""
+    digest = hashlib.sha1()
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return len(scopus_data), os.path.getsize(csv_path), digest.hexdigest()
+
+
+def save_index(vectorizer, fields, fingerprint, index_dir=INDEX_DIR):
+    """Write each field's corpus matrix and the fitted pipeline to disk"""
+    os.makedirs(index_dir, exist_ok=True)
+    masks = {}
+    for field, (X_corpus, mask) in fields.items():
+        scipy.sparse.save_npz(_matrix_path(field, index_dir), X_corpus)
+        masks[field] = mask
+    joblib.dump((vectorizer, masks, fingerprint), _model_path(index_dir))
+
+
+def is_complete(index_dir=INDEX_DIR):
+    """True when every index file is present on disk"""
+    paths = [_model_path(index_dir)] + [_matrix_path(field, index_dir) for field in SIMILARITY_FIELDS]
+    return all(os.path.exists(path) for path in paths)
+
+
+def load_index(index_dir=INDEX_DIR):
+    """Read back the fitted pipeline, per-field (corpus matrix, mask) pairs and fingerprint"""
+    vectorizer, masks, fingerprint = joblib.load(_model_path(index_dir))
+    fields = {
+        field: (scipy.sparse.load_npz(_matrix_path(field, index_dir)), masks[field])
+        for field in SIMILARITY_FIELDS
+    }
+    return vectorizer, fields, fingerprint
+
+
+def load_or_build(scopus_data, csv_path=SCOPUS_CSV, index_dir=INDEX_DIR):
+    """Load the persisted index, refitting and saving it first if it does not match scopus_data.
+
+    Returns the fitted pipeline, the per-field (corpus matrix, mask) pairs and
+    the corpus fingerprint, which identifies the index for query caching.
+    """
+    fingerprint = csv_fingerprint(scopus_data, csv_path)
+    if is_complete(index_dir):
+        try:
+            vectorizer, fields, saved_fingerprint = load_index(index_dir)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, KeyError) as e:
+            # Truncated files or pickles from another sklearn version are refitted
+            print(f"Warning: could not load TF-IDF index, rebuilding: {e}")
+        else:
+            # Compare contents, not mtimes: copies and archives can carry older timestamps
+            if saved_fingerprint == fingerprint and all(
+                len(mask) == len(scopus_data) for _, mask in fields.values()
+            ):
+                return vectorizer, fields, fingerprint
+
+    vectorizer, fields = fit_field_vectors(scopus_data)
+    try:
+        save_index(vectorizer, fields, fingerprint, index_dir)
+    except OSError as e:
+        # Read-only deployments still get a working in-memory index
+        print(f"Warning: could not persist TF-IDF index: {e}")
+    return vectorizer, fields, fingerprint